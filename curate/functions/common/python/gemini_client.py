@@ -4,6 +4,7 @@ Gemini API Client for Lambda functions.
 This module provides a common interface for interacting with the Gemini API.
 """
 
+import asyncio
 import logging
 import os
 from dataclasses import dataclass
@@ -119,26 +120,134 @@ class GeminiClient:
         if isinstance(contents, str):
             contents = [contents]
 
-        config_params = {
-            "temperature": temperature or self._config.temperature,
-            "top_p": top_p or self._config.top_p,
-            "top_k": top_k or self._config.top_k,
-            "max_output_tokens": max_output_tokens or self._config.max_output_tokens,
-            "response_mime_type": response_mime_type or self._config.response_mime_type,
-            "safety_settings": self._get_default_safety_settings(),
-        }
+        response = self._client.models.generate_content(
+            model=model or self._config.model,
+            contents=contents,
+            config=self._get_generate_content_config(
+                system_instruction=system_instruction,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                max_output_tokens=max_output_tokens,
+                response_mime_type=response_mime_type,
+            ),
+        )
 
-        if system_instruction:
-            config_params["system_instruction"] = system_instruction
+        return response.candidates[0].content.parts[0].text
 
-        response = self._client.models.generate_content(
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=4, max=60),
+        retry=retry_if_exception(lambda e: isinstance(e, ClientError)),
+        before_sleep=lambda retry_state: logger.info(f"Retrying due to {retry_state.outcome.exception()}...")
+    )
+    async def generate_content_async(
+        self,
+        contents: str | list[str],
+        system_instruction: str | None = None,
+        model: str | None = None,
+        temperature: float | None = None,
+        top_p: float | None = None,
+        top_k: int | None = None,
+        max_output_tokens: int | None = None,
+        response_mime_type: str | None = None,
+    ) -> str:
+        """
+        Generate content asynchronously using the Gemini API.
+
+        Takes the same parameters as generate_content().
+
+        Returns
+        -------
+        str
+            The generated content.
+        """
+        if isinstance(contents, str):
+            contents = [contents]
+
+        response = await self._client.aio.models.generate_content(
             model=model or self._config.model,
             contents=contents,
-            config=types.GenerateContentConfig(**config_params),
+            config=self._get_generate_content_config(
+                system_instruction=system_instruction,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                max_output_tokens=max_output_tokens,
+                response_mime_type=response_mime_type,
+            ),
         )
 
         return response.candidates[0].content.parts[0].text
 
+    def generate_content_batch(
+        self,
+        contents_list: list[str | list[str]],
+        system_instruction_list: list[str | None] | None = None,
+        max_concurrency: int = 4,
+        **kwargs,
+    ) -> list[str | None]:
+        """
+        Generate contents for multiple requests concurrently.
+
+        A request that still fails after retries is logged and yields None,
+        so that it does not discard the rest of the batch.
+
+        Parameters
+        ----------
+        contents_list : list[str | list[str]]
+            The contents to generate from, one per request.
+        system_instruction_list : list[str | None] | None
+            The system instructions to use, one per request.
+            If not provided, no system instruction will be used.
+        max_concurrency : int
+            The maximum number of requests in flight at once.
+        **kwargs
+            Other parameters passed to generate_content_async().
+
+        Returns
+        -------
+        list[str | None]
+            The generated contents, in the same order as contents_list.
+            None for requests that failed.
+        """
+        if system_instruction_list is None:
+            system_instruction_list = [None] * len(contents_list)
+        if len(system_instruction_list) != len(contents_list):
+            raise ValueError(
+                "contents_list and system_instruction_list must have the same length"
+            )
+
+        async def generate_all() -> list[str | BaseException]:
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def generate(
+                contents: str | list[str], system_instruction: str | None
+            ) -> str:
+                async with semaphore:
+                    return await self.generate_content_async(
+                        contents, system_instruction=system_instruction, **kwargs
+                    )
+
+            return await asyncio.gather(
+                *(
+                    generate(contents, system_instruction)
+                    for contents, system_instruction in zip(
+                        contents_list, system_instruction_list
+                    )
+                ),
+                return_exceptions=True,
+            )
+
+        results = []
+        for i, result in enumerate(asyncio.run(generate_all())):
+            if isinstance(result, BaseException):
+                logger.error(f"Request {i} of the batch failed: {result!r}")
+                results.append(None)
+            else:
+                results.append(result)
+        return results
+
     def create_chat(
         self,
         model: str | None = None,
@@ -238,6 +347,37 @@ class GeminiClient:
         finally:
             self._config.use_search = original_use_search
 
+    def _get_generate_content_config(
+        self,
+        system_instruction: str | None = None,
+        temperature: float | None = None,
+        top_p: float | None = None,
+        top_k: int | None = None,
+        max_output_tokens: int | None = None,
+        response_mime_type: str | None = None,
+    ) -> types.GenerateContentConfig:
+        """
+        Get the generation config, falling back to the client config.
+
+        Returns
+        -------
+        types.GenerateContentConfig
+            The generation config.
+        """
+        config_params = {
+            "temperature": temperature or self._config.temperature,
+            "top_p": top_p or self._config.top_p,
+            "top_k": top_k or self._config.top_k,
+            "max_output_tokens": max_output_tokens or self._config.max_output_tokens,
+            "response_mime_type": response_mime_type or self._config.response_mime_type,
+            "safety_settings": self._get_default_safety_settings(),
+        }
+
+        if system_instruction:
+            config_params["system_instruction"] = system_instruction
+
+        return types.GenerateContentConfig(**config_params)
+
     def _get_default_safety_settings(self) -> list[types.SafetySetting]:
         """
         Get the default safety settings.
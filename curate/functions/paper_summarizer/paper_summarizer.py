@@ -1,4 +1,4 @@
-import concurrent.futures
+import asyncio
 import inspect
 import os
 import re
@@ -7,19 +7,111 @@ from datetime import date, timedelta
 from typing import Any
 
 import arxiv
+import httpx
 import requests
-from bs4 import BeautifulSoup
-from tqdm import tqdm
+from lxml import etree
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ..common.python.gemini_client import create_client
 
 
 class Config:
     hugging_face_api_url_format = "https://huggingface.co/papers?date={date}"
-    arxiv_id_regex = r"\d{4}\.\d{5}"
+    arxiv_html_url_format = "https://arxiv.org/html/{arxiv_id}"
+    arxiv_html_max_concurrency = 4
+    arxiv_html_timeout = 60.0
+    summary_max_concurrency = 4
+    http_pool_size = 20
+    http_max_retries = 3
     arxiv_ids_s3_key_format = "paper_summarizer/arxiv_ids-{date}.txt"
     summary_index_s3_key_format = "paper_summarizer/{date}.md"
 
+_SKIP_RE = re.compile(
+    r"@|university|lab|department|institute|corresponding author", re.IGNORECASE
+)
+_MOJIBAKE_A_TRANSLATION = str.maketrans({"Â": " "})
+_BODY_PARSER = lxml_html.HTMLParser(
+    encoding="utf-8", remove_comments=True, remove_pis=True
+)
+_EXCLUDED_BODY_TAGS = ("header", "nav", "footer", "script", "style")
+
+_SYSTEM_INSTRUCTION_FORMAT = inspect.cleandoc(
+    """
+    The following text is a paper's title, URL, abstract, and contents.
+    The contents are extracted from HTML and may contain noise or irrelevant parts.
+    Please read carefully and answer the user's questions.
+
+    title
+    '''
+    {title}
+    '''
+
+    url
+    '''
+    {url}
+    '''
+
+    abstract
+    '''
+    {abstract}
+    '''
+
+    contents
+    '''
+    {contents}
+    '''
+    """
+)
+
+_CONTENTS = inspect.cleandoc(
+    """
+    Here are the paper's summary and findings:
+    Summarize the paper concisely, highlighting its contributions and findings.
+    """
+)
+
+def _is_arxiv_id(text: str) -> bool:
+    """Checks if the text is a new-style arXiv ID such as 2501.12345."""
+    return (
+        len(text) == 10
+        and text[:4].isdecimal()
+        and text[4] == "."
+        and text[5:].isdecimal()
+    )
+
+
+def _create_session() -> requests.Session:
+    """Creates a keep-alive session that retries transient failures."""
+    adapter = HTTPAdapter(
+        pool_connections=Config.http_pool_size,
+        pool_maxsize=Config.http_pool_size,
+        max_retries=Retry(
+            total=Config.http_max_retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+def _remove_outer_markers(text: str, opening: str, closing: str) -> str:
+    """
+    Removes the first `opening` marker and the last `closing` marker after it,
+    leaving the text around and between them intact.
+    """
+    start = text.find(opening)
+    if start == -1:
+        return text
+    end = text.rfind(closing)
+    if end < start + len(opening):
+        return text
+    return text[:start] + text[start + len(opening) : end] + text[end + len(closing) :]
+
+
 def remove_tex_backticks(text: str) -> str:
     r"""
     Removes the outer backticks (`) from text formatted in TeX, such as
@@ -28,24 +120,30 @@ def remove_tex_backticks(text: str) -> str:
     $\ldots$
     """
 
-    pattern = r"^`(\$.*?\$)`$"
-    return re.sub(pattern, r"\1", text)
+    # Like a regex `$`, allow a single trailing newline after the closing backtick.
+    body, newline = (text[:-1], "\n") if text.endswith("\n") else (text, "")
+    if (
+        len(body) >= 4
+        and body.startswith("`$")
+        and body.endswith("$`")
+        and "\n" not in body
+    ):
+        return body[1:-1] + newline
+    return text
 
 
 def remove_outer_markdown_markers(text: str) -> str:
     """
     Removes the outer '```markdown' blocks from the text, leaving inner ones intact.
     """
-    pattern = r"```markdown(.*)```"
-    return re.sub(pattern, lambda m: m.group(1), text, flags=re.DOTALL)
+    return _remove_outer_markers(text, "```markdown", "```")
 
 
 def remove_outer_singlequotes(text: str) -> str:
     """
     Removes the outer "'''" markers from the text, leaving inner ones intact.
     """
-    pattern = r"'''(.*)'''"
-    return re.sub(pattern, lambda m: m.group(1), text, flags=re.DOTALL)
+    return _remove_outer_markers(text, "'''", "'''")
 
 @dataclass
 class PaperInfo:
@@ -56,61 +154,84 @@ class PaperInfo:
     summary: str = field(init=False)
 
 class PaperIdRetriever:
+    def __init__(self, session: requests.Session | None = None):
+        self._session = session or _create_session()
+
     def retrieve_from_hugging_face(self) -> list[str]:
         arxiv_ids = []
+        seen = set()
         try:
-            response = requests.get(
+            response = self._session.get(
                 url=Config.hugging_face_api_url_format.format(
                     date=(date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
                 )
             )
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-            for article in soup.find_all("article"):
-                for a in article.find_all("a"):
-                    href = a.get("href")
-                    if re.match(rf"^/papers/{Config.arxiv_id_regex}$", href):
-                        arxiv_ids.append(href.split("/")[-1])
-        except requests.exceptions.RequestException as e:
+            tree = lxml_html.fromstring(response.content)
+            for href in tree.xpath('//article//a/@href[starts-with(., "/papers/")]'):
+                arxiv_id = href[len("/papers/") :]
+                if _is_arxiv_id(arxiv_id) and arxiv_id not in seen:
+                    seen.add(arxiv_id)
+                    arxiv_ids.append(arxiv_id)
+        except (requests.exceptions.RequestException, etree.ParserError) as e:
             print(f"Error when retrieving papers from Hugging Face: {e}")
-        return list(set(arxiv_ids))
+        return arxiv_ids
 
 class PaperSummarizer:
+    _system_instruction_format = _SYSTEM_INSTRUCTION_FORMAT
+    _contents = _CONTENTS
+
     def __init__(self):
         self._client = create_client()
         self._arxiv = arxiv.Client()
-        self._paper_id_retriever = PaperIdRetriever()
+        self._session = _create_session()
+        self._paper_id_retriever = PaperIdRetriever(self._session)
+        self._output_dir = os.environ.get("OUTPUT_DIR", "./output")
         self._old_arxiv_ids = self._load_old_arxiv_ids()
 
     def __call__(self) -> None:
+        date_str = date.today().strftime("%Y-%m-%d")
         new_arxiv_ids = self._paper_id_retriever.retrieve_from_hugging_face()
         new_arxiv_ids = self._remove_duplicates(new_arxiv_ids)
         print(f"The number of new arXiv IDs: {len(new_arxiv_ids)}")
+        arxiv_results = self._retrieve_arxiv_results(new_arxiv_ids)
+        for arxiv_id in new_arxiv_ids:
+            if arxiv_results.get(arxiv_id) is None:
+                print(f"Skipping {arxiv_id}: no metadata found on arXiv")
+        new_arxiv_ids = [
+            arxiv_id for arxiv_id in new_arxiv_ids if arxiv_id in arxiv_results
+        ]
+        html_pages = asyncio.run(self._fetch_html_pages(new_arxiv_ids))
+        paper_infos = [
+            self._retrieve_paper_info(arxiv_results[arxiv_id], html)
+            for arxiv_id, html in zip(new_arxiv_ids, html_pages)
+        ]
+        print(f"Summarizing {len(paper_infos)} papers...")
+        summaries = self._summarize_paper_infos(paper_infos)
+        summarized_arxiv_ids = []
         markdowns = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            markdowns = list(
-                tqdm(
-                    executor.map(self._process_paper, new_arxiv_ids),
-                    total=len(new_arxiv_ids),
-                    desc="Summarizing papers",
-                )
-            )
-        self._save_arxiv_ids(new_arxiv_ids)
-        self._store_summaries(markdowns)
-
-    def _process_paper(self, arxiv_id: str) -> str:
-        paper_info = self._retrieve_paper_info(arxiv_id)
-        paper_info.summary = self._summarize_paper_info(paper_info)
-        return self._stylize_paper_info(paper_info)
-
-    def _retrieve_paper_info(self, id_or_url: str) -> PaperInfo:
-        if id_or_url.startswith("https://arxiv.org/"):
-            arxiv_id = id_or_url.split("/")[-1]
-        else:
-            arxiv_id = id_or_url
-        search = arxiv.Search(id_list=[arxiv_id])
-        info = next(self._arxiv.results(search))
-        contents = self._extract_body_text(arxiv_id)
+        for arxiv_id, paper_info, summary in zip(new_arxiv_ids, paper_infos, summaries):
+            if summary is None:
+                print(f"Skipping {arxiv_id}: summarization failed")
+                continue
+            paper_info.summary = summary
+            markdowns.append(self._stylize_paper_info(paper_info))
+            summarized_arxiv_ids.append(arxiv_id)
+        self._save_arxiv_ids(summarized_arxiv_ids, date_str)
+        self._store_summaries(markdowns, date_str)
+
+    def _retrieve_arxiv_results(self, arxiv_ids: list[str]) -> dict[str, arxiv.Result]:
+        """Looks up the metadata of all papers with a single arXiv query."""
+        if not arxiv_ids:
+            return {}
+        search = arxiv.Search(id_list=arxiv_ids, max_results=len(arxiv_ids))
+        return {
+            result.get_short_id().split("v")[0]: result
+            for result in self._arxiv.results(search)
+        }
+
+    def _retrieve_paper_info(self, info: arxiv.Result, html: bytes) -> PaperInfo:
+        contents = self._extract_body_text(html)
         return PaperInfo(
             title=info.title,
             abstract=info.summary,
@@ -118,16 +239,21 @@ class PaperSummarizer:
             contents=contents,
         )
 
-    def _summarize_paper_info(self, paper_info: PaperInfo) -> str:
-        system_instruction = self._system_instruction_format.format(
-            title=paper_info.title,
-            url=paper_info.url,
-            abstract=paper_info.abstract,
-            contents=paper_info.contents,
-        )
-        return self._client.generate_content(
-            contents=self._contents,
-            system_instruction=system_instruction,
+    def _summarize_paper_infos(
+        self, paper_infos: list[PaperInfo]
+    ) -> list[str | None]:
+        return self._client.generate_content_batch(
+            contents_list=[self._contents] * len(paper_infos),
+            system_instruction_list=[
+                self._system_instruction_format.format(
+                    title=paper_info.title,
+                    url=paper_info.url,
+                    abstract=paper_info.abstract,
+                    contents=paper_info.contents,
+                )
+                for paper_info in paper_infos
+            ],
+            max_concurrency=Config.summary_max_concurrency,
         )
 
     def _stylize_paper_info(self, paper_info: PaperInfo) -> str:
@@ -138,44 +264,44 @@ class PaperSummarizer:
         return summary
 
     def _remove_duplicates(self, new_arxiv_ids: list[str]) -> list[str]:
-        return list(set(new_arxiv_ids) - set(self._old_arxiv_ids))
+        return [
+            arxiv_id
+            for arxiv_id in new_arxiv_ids
+            if arxiv_id not in self._old_arxiv_ids
+        ]
 
-    def _store_summaries(self, summaries: list[str]) -> None:
-        date_str = date.today().strftime("%Y-%m-%d")
+    def _store_summaries(self, summaries: list[str], date_str: str) -> None:
         key = Config.summary_index_s3_key_format.format(date=date_str)
-        content = "\n\n---\n\n".join(summaries)
-        output_dir = os.environ.get("OUTPUT_DIR", "./output")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, key)
+        file_path = os.path.join(self._output_dir, key)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        with open(file_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            for i, summary in enumerate(summaries):
+                if i:
+                    f.write("\n\n---\n\n")
+                f.write(summary)
         print(f"Saved summaries to {file_path}")
 
-    def _load_old_arxiv_ids(self) -> list[str]:
-        arxiv_ids = []
-        output_dir = os.environ.get("OUTPUT_DIR", "./output")
+    def _load_old_arxiv_ids(self) -> frozenset[str]:
+        arxiv_ids = set()
+        today = date.today()
         for i in range(1, 8):
             last_n_arxiv_ids_path = os.path.join(
-                output_dir,
+                self._output_dir,
                 Config.arxiv_ids_s3_key_format.format(
-                    date=(date.today() - timedelta(days=i)).strftime("%Y-%m-%d")
+                    date=(today - timedelta(days=i)).strftime("%Y-%m-%d")
                 )
             )
             try:
                 with open(last_n_arxiv_ids_path, "r", encoding="utf-8") as f:
-                    arxiv_ids.extend(f.read().splitlines())
+                    arxiv_ids.update(f.read().splitlines())
             except FileNotFoundError:
                 print(f"No previous IDs found at {last_n_arxiv_ids_path}")
                 continue
-        return arxiv_ids
+        return frozenset(arxiv_ids)
 
-    def _save_arxiv_ids(self, new_arxiv_ids: list[str]) -> None:
-        date_str = date.today().strftime("%Y-%m-%d")
+    def _save_arxiv_ids(self, new_arxiv_ids: list[str], date_str: str) -> None:
         key = Config.arxiv_ids_s3_key_format.format(date=date_str)
-        output_dir = os.environ.get("OUTPUT_DIR", "./output")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, key)
+        file_path = os.path.join(self._output_dir, key)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, "w", encoding="utf-8") as f:
             f.write("\n".join(new_arxiv_ids))
@@ -183,97 +309,64 @@ class PaperSummarizer:
 
     def _is_valid_body_line(self, line: str, min_length: int = 80):
         """Simple heuristic to judge if a line is a valid body line."""
-        if "@" in line:
-            return False
-        for kw in [
-            "university",
-            "lab",
-            "department",
-            "institute",
-            "corresponding author",
-        ]:
-            if kw in line.lower():
-                return False
-        if len(line) < min_length:
-            return False
-        return False if "." not in line else True
-
-    def _extract_body_text(self, arxiv_id: str, min_line_length: int = 40):
-        response = requests.get(f"https://arxiv.org/html/{arxiv_id}")
-        response.encoding = response.apparent_encoding
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        body = soup.body
-        if body:
-            for tag in body.find_all(["header", "nav", "footer", "script", "style"]):
-                tag.decompose()
-            full_text = body.get_text(separator="\n", strip=True)
-        else:
-            full_text = ""
-
-        lines = full_text.splitlines()
-
-        
-        start_index = 0
-        for i, line in enumerate(lines):
-            clean_line = line.strip()
-            
-            if len(clean_line) < min_line_length:
-                continue
-            if self._is_valid_body_line(clean_line, min_length=100):
-                start_index = i
-                break
+        return len(line) >= min_length and "." in line and not _SKIP_RE.search(line)
+
+    async def _fetch_html_pages(self, arxiv_ids: list[str]) -> list[bytes]:
+        """Fetches the arXiv HTML renders of all papers concurrently."""
+        semaphore = asyncio.Semaphore(Config.arxiv_html_max_concurrency)
+
+        async def fetch(client: httpx.AsyncClient, arxiv_id: str) -> bytes:
+            async with semaphore:
+                try:
+                    response = await client.get(
+                        Config.arxiv_html_url_format.format(arxiv_id=arxiv_id)
+                    )
+                except httpx.HTTPError as e:
+                    print(f"Error when retrieving HTML of {arxiv_id}: {e}")
+                    return b""
+            if not response.is_success:
+                print(
+                    f"Error when retrieving HTML of {arxiv_id}: "
+                    f"HTTP {response.status_code}"
+                )
+                return b""
+            return response.content
+
+        async with httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=Config.arxiv_html_max_concurrency),
+            timeout=Config.arxiv_html_timeout,
+            follow_redirects=True,
+        ) as client:
+            return await asyncio.gather(
+                *(fetch(client, arxiv_id) for arxiv_id in arxiv_ids)
+            )
+
+    def _extract_body_text(self, html: bytes, min_line_length: int = 40):
+        try:
+            tree = lxml_html.document_fromstring(html, parser=_BODY_PARSER)
+            body = tree.find("body")
+        except etree.ParserError:
+            body = None
+
+        if body is None:
+            return ""
+        etree.strip_elements(body, *_EXCLUDED_BODY_TAGS, with_tail=False)
 
-        
-        body_lines = lines[start_index:]
-        
+        # Lines before the first valid body line are dropped once it is found,
+        # or all kept if there is none.
         filtered_lines = []
-        for line in body_lines:
-            if len(line.strip()) >= min_line_length:
+        found_start = False
+        for text in body.itertext():
+            for line in text.strip().splitlines():
                 line = line.strip()
-                line = line.replace("Â", " ")
-                filtered_lines.append(line.strip())
+                if len(line) < min_line_length:
+                    continue
+                if not found_start and self._is_valid_body_line(line, min_length=100):
+                    found_start = True
+                    filtered_lines.clear()
+                filtered_lines.append(line.translate(_MOJIBAKE_A_TRANSLATION).strip())
         return "\n".join(filtered_lines)
 
-    @property
-    def _system_instruction_format(self) -> str:
-        return inspect.cleandoc(
-            """
-            The following text is a paper's title, URL, abstract, and contents.
-            The contents are extracted from HTML and may contain noise or irrelevant parts.
-            Please read carefully and answer the user's questions.
-
-            title
-            '''
-            {title}
-            '''
-
-            url
-            '''
-            {url}
-            '''
-
-            abstract
-            '''
-            {abstract}
-            '''
-
-            contents
-            '''
-            {contents}
-            '''
-            """
-        )
-
-    @property
-    def _contents(self) -> str:
-        return inspect.cleandoc(
-            """
-            Here are the paper's summary and findings:
-            Summarize the paper concisely, highlighting its contributions and findings.
-            """
-        )
-
 
 def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     pprint(event)
@@ -1,5 +1,8 @@
+import concurrent.futures
+import functools
 import inspect
 import os
+import threading
 import tomllib
 from dataclasses import dataclass, field
 from datetime import date
@@ -21,17 +24,74 @@ _MARKDOWN_FORMAT = """
 {summary}
 """
 
+_SYSTEM_INSTRUCTION_FORMAT = inspect.cleandoc(
+    """
+    The following text contains the title of a Reddit post and the main comments for the post.
+    Please read it carefully and answer the user's question.
+
+    Title
+    '''
+    {title}
+    '''
+
+    Comments
+    '''
+    {comments}
+    '''
+    """
+)
+
+_SYSTEM_INSTRUCTION_WITH_SELFTEXT_FORMAT = inspect.cleandoc(
+    """
+    The following text contains the title of a Reddit post, the post text, and the main comments for the post.
+    Please read it carefully and answer the user's question.
+
+    Title
+    '''
+    {title}
+    '''
+
+    Post Text
+    '''
+    {selftext}
+    '''
+
+    Comments
+    '''
+    {comments}
+    '''
+    """
+)
+
+_CONTENTS = inspect.cleandoc(
+    """
+    Please answer the following two questions in detail and clearly.
+
+    1. Describe the content of this post.
+    2. Among the comments on this post, which ones are particularly interesting?
+
+    Do not output anything other than the answers to these questions.
+    """
+)
+
+_SKIPPED_POST_TYPES = frozenset({"gallery", "poll", "crosspost"})
+
 class Config:
     reddit_top_posts_limit = 10
     reddit_top_comments_limit = 3
+    reddit_max_workers = 4
+    summary_max_concurrency = 4
     summary_index_s3_key_format = "reddit_explorer/{date}.md"
 
     @classmethod
-    def load_subreddits(cls) -> list[str]:
+    @functools.cache
+    def load_subreddits(cls) -> tuple[str, ...]:
         subreddits_toml_path = os.path.join(os.path.dirname(__file__), "subreddits.toml")
         with open(subreddits_toml_path, "rb") as f:
             subreddits_data = tomllib.load(f)
-        return [subreddit["name"] for subreddit in subreddits_data.get("subreddits", [])]
+        return tuple(
+            subreddit["name"] for subreddit in subreddits_data.get("subreddits", [])
+        )
 
 @dataclass
 class RedditPost:
@@ -47,34 +107,68 @@ class RedditPost:
     thumbnail: str = "self"
 
 class RedditExplorer:
+    _contents = _CONTENTS
+
     def __init__(self):
-        self._reddit = praw.Reddit(
-            client_id=os.environ.get("REDDIT_CLIENT_ID"),
-            client_secret=os.environ.get("REDDIT_CLIENT_SECRET"),
-            user_agent=os.environ.get("REDDIT_USER_AGENT"),
-        )
+        self._thread_local = threading.local()
         self._client = create_client()
         self._subreddits = Config.load_subreddits()
+        self._output_dir = os.environ.get("OUTPUT_DIR", "./output")
 
     def __call__(self) -> None:
-        markdowns = []
-        for subreddit in self._subreddits:
-            posts = self._retrieve_hot_posts(subreddit)
-            for post in posts:
-                post.comments = self._retrieve_top_comments_of_post(post.id)
-                post.summary = self._summarize_reddit_post(post)
-                markdowns.append(self._stylize_post(post))
-        self._store_summaries(markdowns)
-
-    def _store_summaries(self, summaries: list[str]) -> None:
         date_str = date.today().strftime("%Y-%m-%d")
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self._subreddits), 1)
+        ) as executor:
+            posts = [
+                post
+                for subreddit_posts in executor.map(
+                    self._retrieve_hot_posts, self._subreddits
+                )
+                for post in subreddit_posts
+            ]
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=Config.reddit_max_workers
+        ) as executor:
+            comments_of_posts = list(
+                executor.map(
+                    self._retrieve_top_comments_of_post, [post.id for post in posts]
+                )
+            )
+        for post, comments in zip(posts, comments_of_posts):
+            post.comments = comments
+        summaries = self._summarize_reddit_posts(posts)
+        markdowns = []
+        for post, summary in zip(posts, summaries):
+            if summary is None:
+                print(f"Skipping post {post.id}: summarization failed")
+                continue
+            post.summary = summary
+            markdowns.append(self._stylize_post(post))
+        self._store_summaries(markdowns, date_str)
+
+    @property
+    def _reddit(self) -> praw.Reddit:
+        """The PRAW client of the current thread, created on first use."""
+        reddit = getattr(self._thread_local, "reddit", None)
+        if reddit is None:
+            reddit = praw.Reddit(
+                client_id=os.environ.get("REDDIT_CLIENT_ID"),
+                client_secret=os.environ.get("REDDIT_CLIENT_SECRET"),
+                user_agent=os.environ.get("REDDIT_USER_AGENT"),
+            )
+            self._thread_local.reddit = reddit
+        return reddit
+
+    def _store_summaries(self, summaries: list[str], date_str: str) -> None:
         key = Config.summary_index_s3_key_format.format(date=date_str)
-        output_dir = os.environ.get("OUTPUT_DIR", "./output")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, key)
+        file_path = os.path.join(self._output_dir, key)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("\n---\n".join(summaries))
+        with open(file_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            for i, summary in enumerate(summaries):
+                if i:
+                    f.write("\n---\n")
+                f.write(summary)
         print(f"Saved summaries to {file_path}")
 
     def _retrieve_hot_posts(
@@ -87,8 +181,6 @@ class RedditExplorer:
         for post in self._reddit.subreddit(subreddit).hot(limit=limit):
             post_type = self.__judge_post_type(post)
 
-            url = self._get_video_url(post) if post_type == "video" else post.url
-
             # filter out undesired posts
             if post.author.name == "AutoModerator":
                 continue
@@ -96,8 +188,10 @@ class RedditExplorer:
                 continue
             if post.upvote_ratio < 0.7:
                 continue
-            if ["gallery", "poll", "crosspost"].__contains__(post_type):
+            if post_type in _SKIPPED_POST_TYPES:
                 continue
+
+            url = self._get_video_url(post) if post_type == "video" else post.url
             posts.append(
                 RedditPost(
                     type=post_type,
@@ -130,21 +224,24 @@ class RedditExplorer:
             for comment in submission.comments.list()[:limit]
         ]
 
-    def _summarize_reddit_post(self, post: RedditPost) -> str:
-        comments_text = "\n".join(
-            [
-                f"{comment['upvotes']} upvotes: {comment['text']}"
-                for comment in post.comments
-            ]
+    def _summarize_reddit_posts(self, posts: list[RedditPost]) -> list[str | None]:
+        return self._client.generate_content_batch(
+            contents_list=[self._contents] * len(posts),
+            system_instruction_list=[
+                self._system_instruction_format(
+                    title=post.title,
+                    comments=self._format_comments(post),
+                    selftext=post.text,
+                )
+                for post in posts
+            ],
+            max_concurrency=Config.summary_max_concurrency,
         )
 
-        return self._client.generate_content(
-            contents=self._contents,
-            system_instruction=self._system_instruction_format(
-                title=post.title,
-                comments=comments_text,
-                selftext=post.text,
-            ),
+    def _format_comments(self, post: RedditPost) -> str:
+        return "\n".join(
+            f"{comment['upvotes']} upvotes: {comment['text']}"
+            for comment in post.comments
         )
 
     def __judge_post_type(
@@ -190,45 +287,11 @@ class RedditExplorer:
     def _system_instruction_format(
         self, title: str, comments: str, selftext: str
     ) -> str:
-        self_text = inspect.cleandoc(
-            f"""
-            Post Text
-            '''
-            {selftext}
-            '''
-            """
-        )
-        return inspect.cleandoc(
-            f"""
-            The following text contains the title of a Reddit post, {"the post text, and" if selftext else ""} and the main comments for the post.
-            Please read it carefully and answer the user's question.
-
-            Title
-            '''
-            {title}
-            '''
-
-            {self_text if selftext else ""}
-
-            Comments
-            '''
-            {comments}
-            '''
-            """
-        )
-
-    @property
-    def _contents(self) -> str:
-        return inspect.cleandoc(
-            """
-            Please answer the following two questions in detail and clearly.
-
-            1. Describe the content of this post.
-            2. Among the comments on this post, which ones are particularly interesting?
-
-            Do not output anything other than the answers to these questions.
-            """
-        )
+        if selftext:
+            return _SYSTEM_INSTRUCTION_WITH_SELFTEXT_FORMAT.format(
+                title=title, comments=comments, selftext=selftext
+            )
+        return _SYSTEM_INSTRUCTION_FORMAT.format(title=title, comments=comments)
 
 
 def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
@@ -1,5 +1,7 @@
 # main.py
+import concurrent.futures
 import os
+import traceback
 from datetime import date
 
 #from nook.functions.tech_feed.tech_feed import TechFeed
@@ -11,6 +13,17 @@ from nook.functions.paper_summarizer.paper_summarizer import PaperSummarizer
 from nook.functions.reddit_explorer.reddit_explorer import RedditExplorer
 
 
+def run_handler(handler_cls):
+    name = handler_cls.__name__
+    print(f"Running {name}...")
+    try:
+        handler = handler_cls()
+        handler()
+    except Exception:
+        print(f"Failed {name}:\n{traceback.format_exc()}")
+        return
+    print(f"Completed {name}")
+
 def run_all():
     load_dotenv()
     
@@ -19,17 +32,15 @@ def run_all():
     os.environ["OUTPUT_DIR"] = OUTPUT_DIR
 
     handlers = [
-        PaperSummarizer(),
-        HackerNewsRetriever(),
-        RedditExplorer(),
-        GithubTrending(),
-#     TechFeed(),
+        PaperSummarizer,
+        HackerNewsRetriever,
+        RedditExplorer,
+        GithubTrending,
+#     TechFeed,
     ]
     
-    for handler in handlers:
-        print(f"Running {handler.__class__.__name__}...")
-        handler()
-        print(f"Completed {handler.__class__.__name__}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(handlers)) as executor:
+        list(executor.map(run_handler, handlers))
 
 if __name__ == "__main__":
     run_all()
\ No newline at end of file